@@ -1,13 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image, ImageTk
 import pyaudio
-import threading
 import time # For time.sleep if ever needed, not actively used for critical timing
 import traceback # For more detailed error printing if needed
 import sys # For sys.exit as a last resort diagnostic
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Callable
+
+try:
+    from numba import njit # Optional: speeds up the sine oscillator loop
+except ImportError:
+    njit = None
 
 # --- Constants ---
 SAMPLE_RATE = 44100
@@ -15,8 +23,92 @@ PLAY_DURATION_S = 5.0
 AMPLITUDE = 0.5
 FRAMES_PER_BUFFER = 1024
 
+@dataclass(frozen=True)
+class _PlaybackState:
+    # Shared with the PortAudio callback; always replaced whole, never mutated
+    period: np.ndarray
+    position: int = 0
+    remaining: int = 0
+
+def _sine_recurrence(num_samples, omega, amplitude):
+    # Recursive oscillator: y[n+1] = 2*cos(w)*y[n] - y[n-1], no sin() per sample
+    out = np.empty(num_samples, dtype=np.float32)
+    c = 2.0 * np.cos(omega)
+    y0 = 0.0
+    y1 = np.sin(omega)
+    if num_samples > 0: out[0] = 0.0
+    if num_samples > 1: out[1] = amplitude * y1
+    for n in range(2, num_samples):
+        y2 = c * y1 - y0
+        out[n] = amplitude * y2
+        y0 = y1
+        y1 = y2
+    return out
+
+if njit is not None:
+    _sine_recurrence = njit(cache=True)(_sine_recurrence)
+
+# Generated arrays are cached and shared between callers, so they are returned read-only
+@lru_cache(maxsize=16)
+def _time_axis(duration, sample_rate):
+    # float32 sample times, built without a float64 linspace
+    num_samples = int(round(sample_rate * duration))
+    t = np.multiply(np.arange(num_samples, dtype=np.float32), np.float32(1.0 / sample_rate))
+    t.setflags(write=False)
+    return t
+
+@lru_cache(maxsize=16)
+def _sine_cached(frequency, duration, sample_rate):
+    t = _time_axis(duration, sample_rate)
+    if njit is not None:
+        buf = _sine_recurrence(len(t), 2 * np.pi * frequency / sample_rate, AMPLITUDE)
+    else:
+        buf = np.multiply(t, np.float32(2 * np.pi * frequency))
+        np.sin(buf, out=buf)
+        np.multiply(buf, np.float32(AMPLITUDE), out=buf)
+    buf.setflags(write=False)
+    return buf
+
+@lru_cache(maxsize=16)
+def _square_cached(frequency, duration, sample_rate):
+    t = _time_axis(duration, sample_rate)
+    buf = np.multiply(t, np.float32(frequency))
+    np.mod(buf, np.float32(1.0), out=buf)
+    # High for the first half of each period, low for the second half
+    buf = np.where(buf < 0.5, np.float32(AMPLITUDE), np.float32(-AMPLITUDE))
+    buf.setflags(write=False)
+    return buf
+
+@lru_cache(maxsize=16)
+def _triangle_cached(frequency, duration, sample_rate):
+    t = _time_axis(duration, sample_rate)
+    # Piecewise-linear in the fractional phase; shifted by a quarter period
+    # so it starts at zero and rises, like a sine
+    buf = np.multiply(t, np.float32(frequency))
+    np.add(buf, np.float32(0.25), out=buf)
+    np.mod(buf, np.float32(1.0), out=buf)
+    np.subtract(buf, np.float32(0.5), out=buf)
+    np.abs(buf, out=buf)
+    np.multiply(buf, np.float32(-4.0 * AMPLITUDE), out=buf)
+    np.add(buf, np.float32(AMPLITUDE), out=buf)
+    buf.setflags(write=False)
+    return buf
+
+@lru_cache(maxsize=16)
+def _sawtooth_cached(frequency, duration, sample_rate):
+    t = _time_axis(duration, sample_rate)
+    buf = np.multiply(t, np.float32(frequency))
+    np.add(buf, np.float32(0.5), out=buf)
+    np.mod(buf, np.float32(1.0), out=buf)
+    np.subtract(buf, np.float32(0.5), out=buf)
+    np.multiply(buf, np.float32(2 * AMPLITUDE), out=buf)
+    buf.setflags(write=False)
+    return buf
+
 class WaveformApp:
     NUM_PERIODS_TO_PLOT = 3
+    PLOT_SAMPLES_PER_PIXEL = 4
+    MAX_LOOP_PERIODS = 1000
 
     def __init__(self, master):
         self.master = master
@@ -27,11 +119,16 @@ class WaveformApp:
             "Triangle": self.generate_triangle, "Sawtooth": self.generate_sawtooth
         }
         self.pa = None
-        self.audio_thread = None
-        self.stop_audio_event = None
+        self.stream = None
         self.audio_active = False
+        self._playback = None
+        self._ui_poll_id = None
+        self._play_buffer = np.empty(FRAMES_PER_BUFFER, dtype=np.float32)
         self.fig = None # Initialize fig attribute
         self.ax = None  # Initialize ax attribute
+        self.line = None # Persistent waveform artist, updated in place
+        self._photo = None # Tk image holding the last rendered frame
+        self._render_pending = False
 
         self._init_gui_elements()
         self._init_pyaudio()
@@ -47,51 +144,80 @@ class WaveformApp:
                                        values=list(self.waveform_generators.keys()),
                                        state="readonly", width=10)
         self.wave_combo.pack(side=tk.LEFT, padx=5)
-        self.wave_combo.bind("<<ComboboxSelected>>", lambda e: self.update_plot_display_only())
+        self.wave_combo.bind("<<ComboboxSelected>>", self._on_wave_type_selected)
         ttk.Label(control_frame, text="Frequency (Hz):").pack(side=tk.LEFT, padx=5)
         self.freq_var = tk.StringVar(value="440")
         self.freq_entry = ttk.Entry(control_frame, textvariable=self.freq_var, width=7)
         self.freq_entry.pack(side=tk.LEFT, padx=5)
         self.freq_entry.bind("<Return>", lambda e: self.update_plot_display_only())
         self.freq_entry.bind("<FocusOut>", lambda e: self.update_plot_display_only())
+        # Generator for the selected waveform, refreshed when the combobox changes
+        self._current_gen: Callable[[float, float, float], tuple[np.ndarray, np.ndarray]] = \
+            self.waveform_generators[self.wave_type_var.get()]
         self.play_stop_button = ttk.Button(control_frame, text="Play", command=self.on_play_stop_button_click)
         self.play_stop_button.pack(side=tk.LEFT, padx=5)
         plot_frame = ttk.Frame(self.master, padding="5")
         plot_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         
-        # Initialize fig and ax here
-        self.fig, self.ax = plt.subplots() 
-        self.canvas = FigureCanvasTkAgg(self.fig, master=plot_frame)
-        self.canvas_widget = self.canvas.get_tk_widget()
-        self.canvas_widget.pack(fill=tk.BOTH, expand=True)
+        # Initialize fig and ax here. The figure is rendered offscreen by Agg
+        # and its RGBA buffer shown in a plain Label.
+        self.fig = Figure()
+        self.ax = self.fig.add_subplot()
+        self.canvas = FigureCanvasAgg(self.fig)
+        width, height = self.fig.canvas.get_width_height()
+        plot_frame.configure(width=width, height=height)
+        self.canvas_widget = tk.Label(plot_frame, borderwidth=0)
+        # place() keeps the image size from feeding back into the layout
+        self.canvas_widget.place(x=0, y=0, relwidth=1, relheight=1)
+        self.canvas_widget.bind("<Configure>", self._on_plot_resize)
         self._setup_plot_style()
+        self.line, = self.ax.plot([], [], color='b')
+
+    def _on_wave_type_selected(self, event=None):
+        self._current_gen = self.waveform_generators[self.wave_type_var.get()]
+        self.update_plot_display_only()
 
     def _init_pyaudio(self):
         try:
             self.pa = pyaudio.PyAudio()
+            # One stream for the app's lifetime; Play/Stop just start and stop it
+            self.stream = self.pa.open(format=pyaudio.paFloat32, channels=1, rate=SAMPLE_RATE,
+                                       output=True, frames_per_buffer=FRAMES_PER_BUFFER,
+                                       stream_callback=self._pa_callback, start=False)
         except Exception as e:
             messagebox.showerror("Audio Error", f"Could not initialize PyAudio: {e}\nPlayback will be disabled.")
+            if self.pa is not None: self.pa.terminate()
             self.pa = None
+            self.stream = None
             if hasattr(self, 'play_stop_button'):
                 self.play_stop_button.config(state=tk.DISABLED)
 
     def generate_sine(self, frequency, duration, sample_rate):
-        t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-        return t, (AMPLITUDE * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+        return _time_axis(duration, sample_rate), _sine_cached(frequency, duration, sample_rate)
 
     def generate_square(self, frequency, duration, sample_rate):
-        t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-        waveform = AMPLITUDE * np.sign(np.sin(2 * np.pi * frequency * t))
-        waveform[waveform == 0] = AMPLITUDE
-        return t, waveform.astype(np.float32)
+        return _time_axis(duration, sample_rate), _square_cached(frequency, duration, sample_rate)
 
     def generate_triangle(self, frequency, duration, sample_rate):
-        t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-        return t, (AMPLITUDE * (2 / np.pi) * np.arcsin(np.sin(2 * np.pi * frequency * t))).astype(np.float32)
+        return _time_axis(duration, sample_rate), _triangle_cached(frequency, duration, sample_rate)
 
     def generate_sawtooth(self, frequency, duration, sample_rate):
-        t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-        return t, (AMPLITUDE * 2 * (t * frequency - np.floor(0.5 + t * frequency))).astype(np.float32)
+        return _time_axis(duration, sample_rate), _sawtooth_cached(frequency, duration, sample_rate)
+
+    def generate_period(self, generator_func, frequency, sample_rate):
+        # The waveforms are strictly periodic, so playback only needs to loop a
+        # buffer of k whole periods. Pick the smallest k that spans a whole
+        # number of samples, so the loop is seamless and the tone keeps its
+        # exact frequency, e.g. 22 periods of 440 Hz = 2205 samples. If no
+        # small k fits, fall back to one buffer covering the whole playback.
+        play_samples = int(PLAY_DURATION_S * sample_rate)
+        periods = np.arange(1, min(max(1, int(frequency)), self.MAX_LOOP_PERIODS) + 1)
+        samples = periods * sample_rate / frequency
+        exact = np.flatnonzero(np.abs(samples - np.round(samples)) < 1e-6)
+        loop_samples = int(round(samples[exact[0]])) if len(exact) > 0 else play_samples
+        loop_samples = max(1, min(loop_samples, play_samples))
+        _, loop = generator_func(frequency, loop_samples / sample_rate, sample_rate)
+        return loop[:loop_samples]
 
     def _setup_plot_style(self):
         if not self.ax: return # Should not happen if _init_gui_elements ran
@@ -104,38 +230,66 @@ class WaveformApp:
         if self.fig: self.fig.tight_layout()
 
     def update_plot_display_only(self, frequency_hz_override=None, wave_type_key_override=None):
-        if self._is_closed or not self.fig or not self.ax: return
-        wave_type_key = wave_type_key_override if wave_type_key_override else self.wave_type_var.get()
+        if self._is_closed or not self.fig or not self.ax or not self.line: return
         frequency_hz = 440.0
         try:
             temp_freq = float(frequency_hz_override if frequency_hz_override is not None else self.freq_var.get())
             if temp_freq > 0: frequency_hz = temp_freq
         except ValueError: pass
-        generator_func = self.waveform_generators[wave_type_key]
+        generator_func = self.waveform_generators[wave_type_key_override] if wave_type_key_override else self._current_gen
         plot_duration_s = max(0.001, min(self.NUM_PERIODS_TO_PLOT / frequency_hz, 0.2))
-        t_plot, waveform_plot = generator_func(frequency_hz, plot_duration_s, SAMPLE_RATE)
-        self.ax.clear()
-        self._setup_plot_style()
-        self.ax.plot(t_plot, waveform_plot, color='b')
+        # The plot only needs a few samples per pixel, not the full audio rate
+        pixels = self.canvas_widget.winfo_width()
+        if pixels <= 1: pixels = 800 # Widget not laid out yet
+        plot_sample_rate = min(SAMPLE_RATE, self.PLOT_SAMPLES_PER_PIXEL * pixels / plot_duration_s)
+        t_plot, waveform_plot = generator_func(frequency_hz, plot_duration_s, plot_sample_rate)
+        # Update the existing line instead of clearing and rebuilding the axes
+        self.line.set_data(t_plot, waveform_plot)
         self.ax.set_xlim(0, plot_duration_s)
+        if self.canvas: self._request_render()
+
+    def _on_plot_resize(self, event):
+        if not self.fig or event.width <= 1 or event.height <= 1: return
+        self.fig.set_size_inches(event.width / self.fig.dpi, event.height / self.fig.dpi)
+        self.fig.tight_layout() # Refit the margins so the axis labels aren't clipped
+        self._request_render()
+
+    def _request_render(self):
+        # Coalesce several updates into one render, like draw_idle
+        if self._render_pending: return
+        self._render_pending = True
+        self.master.after_idle(self._render_plot)
+
+    def _render_plot(self):
+        self._render_pending = False
+        if self._is_closed or not self.canvas: return
+        self.canvas.draw()
+        image = Image.fromarray(np.asarray(self.canvas.buffer_rgba()))
         try:
-            if self.canvas: self.canvas.draw()
+            if self._photo is not None and (self._photo.width(), self._photo.height()) == image.size:
+                self._photo.paste(image) # Reuse the existing Tk image
+            else:
+                self._photo = ImageTk.PhotoImage(image)
+                self.canvas_widget.configure(image=self._photo)
         except tk.TclError: pass
 
     def on_play_stop_button_click(self):
         if self._is_closed: return
-        if not self.pa:
+        if not self.pa or not self.stream:
             messagebox.showerror("Audio Error", "PyAudio is not available.")
             return
         if self.audio_active:
             print("Stop button pressed.")
             self.audio_active = False
-            if self.stop_audio_event: self.stop_audio_event.set()
+            self._stop_stream()
             self.play_stop_button.config(text="Play")
         else:
             print("Play button pressed.")
             try:
                 frequency = float(self.freq_var.get())
+                if not np.isfinite(frequency):
+                    messagebox.showerror("Input Error", "Invalid frequency.")
+                    return
                 if frequency <= 0:
                     messagebox.showerror("Input Error", "Frequency must be positive.")
                     return
@@ -143,68 +297,64 @@ class WaveformApp:
                 messagebox.showerror("Input Error", "Invalid frequency.")
                 return
             self.update_plot_display_only(frequency_hz_override=frequency)
-            if self.audio_thread and self.audio_thread.is_alive():
-                print("Play: Previous audio thread active. Signaling stop...")
-                if self.stop_audio_event: self.stop_audio_event.set()
-                self.audio_thread.join(timeout=0.5)
-                if self.audio_thread.is_alive(): print("Play: Warning! Previous audio thread didn't exit.")
+            self._stop_stream() # A finished stream must be stopped before restarting
             wave_type = self.wave_type_var.get()
-            _, waveform_play = self.waveform_generators[wave_type](frequency, PLAY_DURATION_S, SAMPLE_RATE)
+            self._current_gen = self.waveform_generators[wave_type]
+            waveform_play = self.generate_period(self._current_gen, frequency, SAMPLE_RATE)
+            self._playback = _PlaybackState(period=waveform_play, remaining=int(PLAY_DURATION_S * SAMPLE_RATE))
             self.audio_active = True
             self.play_stop_button.config(text="Stop")
-            self.stop_audio_event = threading.Event()
-            self.audio_thread = threading.Thread(target=self._play_audio_thread_target,
-                                                 args=(self.stop_audio_event, waveform_play, wave_type, frequency))
-            self.audio_thread.daemon = True
-            self.audio_thread.start()
-
-    def _play_audio_thread_target(self, stop_event, audio_data, wave_type, freq):
-        stream = None
-        sound_played = False
-        tid = threading.get_ident()
-        print(f"AudioThread-{tid} ({wave_type}@{freq}Hz): Started.")
+            try:
+                self.stream.start_stream()
+                print(f"Playback started ({wave_type}@{frequency}Hz).")
+            except Exception as e:
+                print(f"Play: Error starting stream: {e}")
+                self.audio_active = False
+            self._update_ui_after_playback_change()
+
+    def _stop_stream(self):
         try:
-            if stop_event.is_set() or not self.audio_active: return
-            if not self.pa: print(f"AudioThread-{tid}: PyAudio (self.pa) is None."); return
-            stream = self.pa.open(format=pyaudio.paFloat32, channels=1, rate=SAMPLE_RATE,
-                                  output=True, frames_per_buffer=FRAMES_PER_BUFFER)
-            print(f"AudioThread-{tid}: Stream opened.")
-            for i in range(0, len(audio_data), FRAMES_PER_BUFFER):
-                if stop_event.is_set() or not self.audio_active: break
-                chunk = audio_data[i:min(i + FRAMES_PER_BUFFER, len(audio_data))]
-                if len(chunk) > 0: stream.write(chunk.tobytes()); sound_played = True
-            if sound_played and not stop_event.is_set() and self.audio_active:
-                 print(f"AudioThread-{tid}: Playback finished naturally.")
-        except Exception as e:
-            if not stop_event.is_set() and self.audio_active : print(f"AudioThread-{tid}: Exception: {e}")
-        finally:
-            print(f"AudioThread-{tid}: Entering finally block.")
-            if stream:
-                try:
-                    print(f"AudioThread-{tid}: Attempting to stop/close stream.")
-                    if stream.is_active(): stream.stop_stream(); print(f"AudioThread-{tid}: Stream stopped.")
-                    stream.close(); print(f"AudioThread-{tid}: Stream closed.")
-                except Exception as e_close: print(f"AudioThread-{tid}: Error stopping/closing stream: {e_close}")
-            else: print(f"AudioThread-{tid}: No stream object in finally.")
-            if not self._is_closed:
-                print(f"AudioThread-{tid}: Scheduling UI update.")
-                if self.master and self.master.winfo_exists(): # Check master exists
-                    self.master.after(0, self._update_ui_after_playback_change)
-                else:
-                    print(f"AudioThread-{tid}: Master window gone, not scheduling UI update.")
-            else: print(f"AudioThread-{tid}: App closing, not scheduling UI update.")
-            print(f"AudioThread-{tid}: Exiting.")
+            if self.stream and not self.stream.is_stopped(): self.stream.stop_stream()
+        except Exception as e: print(f"Error stopping stream: {e}")
+
+    def _pa_callback(self, in_data, frame_count, time_info, status):
+        # Runs on PortAudio's thread: fill the preallocated buffer from the cached period
+        state = self._playback
+        if state is None or not self.audio_active or state.remaining <= 0:
+            return (b'', pyaudio.paComplete)
+        frames = min(frame_count, state.remaining)
+        if frames > len(self._play_buffer): self._play_buffer = np.empty(frames, dtype=np.float32)
+        period_len = len(state.period)
+        out = self._play_buffer[:frames]
+        # The period buffer holds whole periods, so copy contiguous slices,
+        # wrapping to its start as often as needed
+        position = state.position
+        filled = 0
+        while filled < frames:
+            count = min(frames - filled, period_len - position)
+            out[filled:filled + count] = state.period[position:position + count]
+            filled += count
+            position = (position + count) % period_len
+        self._playback = replace(state, position=position, remaining=state.remaining - frames)
+        flag = pyaudio.paContinue if state.remaining > frames else pyaudio.paComplete
+        return (out.tobytes(), flag)
 
     def _update_ui_after_playback_change(self):
+        if self._ui_poll_id is not None:
+            self.master.after_cancel(self._ui_poll_id)
+            self._ui_poll_id = None
         if self._is_closed: return
         try: # Add try-except for robustness during shutdown
             if not self.master.winfo_exists(): return # Check again
             if not self.audio_active:
                 if self.play_stop_button['text'] != "Play": self.play_stop_button.config(text="Play")
             else:
-                if self.audio_thread and self.audio_thread.is_alive():
+                if self.stream and self.stream.is_active():
                     if self.play_stop_button['text'] != "Stop": self.play_stop_button.config(text="Stop")
-                else: # Audio active but thread dead means natural finish or error
+                    # PortAudio can't call back into Tk, so poll until playback finishes
+                    self._ui_poll_id = self.master.after(100, self._update_ui_after_playback_change)
+                else: # Audio active but stream inactive means natural finish or error
+                    print("Playback finished.")
                     self.audio_active = False
                     if self.play_stop_button['text'] != "Play": self.play_stop_button.config(text="Play")
         except tk.TclError:
@@ -219,12 +369,15 @@ class WaveformApp:
             return
         print("Application closing sequence initiated...")
         self.audio_active = False
-        if self.stop_audio_event: self.stop_audio_event.set()
 
-        if self.audio_thread and self.audio_thread.is_alive():
-            print("Waiting for audio thread to exit (max 1s)...")
-            self.audio_thread.join(timeout=1.0)
-            if self.audio_thread.is_alive(): print("Warning: Audio thread did not terminate cleanly.")
+        if self.stream is not None:
+            try:
+                print("Closing audio stream...")
+                self._stop_stream()
+                self.stream.close()
+                self.stream = None
+                print("Audio stream closed.")
+            except Exception as e: print(f"Error closing audio stream: {e}")
 
         if self.pa is not None:
             try:
@@ -238,9 +391,9 @@ class WaveformApp:
         if self.fig is not None:
             try:
                 print("Closing Matplotlib figure...")
-                plt.close(self.fig) # Close the figure object
-                self.fig = None
+                self.fig = None # Offscreen figure, not managed by pyplot
                 self.canvas = None # Also clear canvas reference
+                self._photo = None
                 print("Matplotlib figure closed.")
             except Exception as e: print(f"Error closing Matplotlib figure: {e}")
         
@@ -20,9 +20,13 @@ ax.spines['left'].set_position('zero')
 
 ax.plot(x, y, color='white', linewidth=2)
 
-ax.fill_between(x, y, where=(y > 0), color='red', alpha=0.5, interpolate=True,
+# Sign masks are computed once and shared by both fills
+pos_mask = y > 0
+neg_mask = y < 0
+
+ax.fill_between(x, y, 0, where=pos_mask, color='red', alpha=0.5, interpolate=True,
                 label='Positive Area, f(x) > 0')
-ax.fill_between(x, y, 0, where=(y < 0), color='blue', alpha=0.5, interpolate=True,
+ax.fill_between(x, y, 0, where=neg_mask, color='blue', alpha=0.5, interpolate=True,
                 label='Negative Area, f(x) < 0')
 
 ax.legend()
@@ -30,7 +30,8 @@ class SimpleFunctionApproximation(Scene):
 
         def func_to_approximate(x):
             # A cubic function that stays mostly within the y-range [0, 3.5]
-            return 3 / 256 * np.power(x, 3) - 9 / 16 * x + 1.75
+            # float32 constants keep array evaluation in float32
+            return np.float32(3 / 256) * x * x * x - np.float32(9 / 16) * x + np.float32(1.75)
         
         # Max value the function attains in the domain for coloring purposes
         func_max_val = 3.5
@@ -47,46 +48,58 @@ class SimpleFunctionApproximation(Scene):
         self.wait(1)
 
         # 2. --- RECTANGLE CREATION LOGIC ---
-        def create_simple_function_rectangles(n, x_domain=[-8, 8], dx=0.001):
+        # The sample grid and the function values on it are the same for every n
+        x_domain = [-8, 8]
+        dx = 0.001
+        # Step in float64 and cast, so rounding doesn't accumulate along the grid
+        x_values = np.arange(x_domain[0], x_domain[1] + dx, dx).astype(np.float32)
+        y_values = func_to_approximate(x_values)
+
+        def create_simple_function_rectangles(n):
             """Creates a VGroup of rectangles approximating the function for a given n."""
-            simple_func = lambda x: np.floor(func_to_approximate(x) * n) / n
             rectangles = VGroup()
-            x_values = np.arange(x_domain[0], x_domain[1] + dx, dx)
             
             colormap = cm.viridis_r
             norm = mcolors.Normalize(vmin=0, vmax=func_max_val)
             
-            current_y = simple_func(x_values[0])
-            segment_start_x = x_values[0]
-
-            for x_val in x_values[1:]:
-                new_y = simple_func(x_val)
-                if not np.isclose(new_y, current_y):
-                    if current_y > 1e-6:
-                        rect_width = x_val - segment_start_x
-                        rect = Rectangle(
-                            width=axes.x_axis.unit_size * rect_width,
-                            height=axes.y_axis.unit_size * current_y,
-                            stroke_width=0,
-                            fill_opacity=1,
-                            color=mcolors.to_hex(colormap(norm(current_y)))
-                        )
-                        rect.move_to(axes.c2p(segment_start_x, 0), aligned_edge=DL)
-                        rectangles.add(rect)
-                    
-                    segment_start_x = x_val
-                    current_y = new_y
-            
-            if current_y > 1e-6:
-                rect_width = x_values[-1] - segment_start_x
+            # Evaluate the whole grid at once and split it wherever the
+            # quantized value steps. Quantized values compare exactly.
+            y_quant = np.floor(y_values * np.float32(n)) * np.float32(1.0 / n)
+            edges = np.concatenate((
+                [0],
+                np.flatnonzero(np.diff(y_quant) != 0) + 1,
+                [len(x_values)]
+            ))
+
+            # Gather the geometry of every segment as arrays,
+            # dropping the ones that sit on the x-axis
+            starts = edges[:-1]
+            ends = np.minimum(edges[1:], len(x_values) - 1)
+            heights = y_quant[starts]
+            keep = heights > 1e-6
+            heights = heights[keep]
+            start_xs = x_values[starts][keep]
+            widths = x_values[ends][keep] - start_xs
+            corners = np.atleast_2d(axes.c2p(np.column_stack((start_xs, np.zeros_like(start_xs)))))
+
+            # Loop invariants: axis scales, and one color per quantized height level
+            unit_x = axes.x_axis.unit_size
+            unit_y = axes.y_axis.unit_size
+            color_cache = {}
+
+            for rect_width, rect_height, corner in zip(widths, heights, corners):
+                level = round(rect_height * n)
+                color = color_cache.get(level)
+                if color is None:
+                    color = color_cache[level] = mcolors.to_hex(colormap(norm(rect_height)))
                 rect = Rectangle(
-                    width=axes.x_axis.unit_size * rect_width,
-                    height=axes.y_axis.unit_size * current_y,
+                    width=unit_x * rect_width,
+                    height=unit_y * rect_height,
                     stroke_width=0,
                     fill_opacity=1,
-                    color=mcolors.to_hex(colormap(norm(current_y)))
+                    color=color
                 )
-                rect.move_to(axes.c2p(segment_start_x, 0), aligned_edge=DL)
+                rect.move_to(corner, aligned_edge=DL)
                 rectangles.add(rect)
 
             return rectangles
@@ -94,9 +107,11 @@ class SimpleFunctionApproximation(Scene):
         # 3. --- ANIMATION ---
         n_values = [1, 2, 4, 8, 16, 32]
         
+        # Build every approximation up front so the animation loop only plays them
+        all_approx_rects = [create_simple_function_rectangles(n) for n in n_values]
+        
         # --- Create and display the initial state (n=1) ---
-        current_n = n_values[0]
-        current_approx_rects = create_simple_function_rectangles(current_n)
+        current_approx_rects = all_approx_rects[0]
         
 
         self.play(
@@ -106,32 +121,37 @@ class SimpleFunctionApproximation(Scene):
 
         # --- Loop through n_values and create the custom splitting animation ---
         for i in range(1, len(n_values)):
-            next_n = n_values[i]
-            next_approx_rects = create_simple_function_rectangles(next_n)
+            next_approx_rects = all_approx_rects[i]
 
             # --- CUSTOM SPLITTING ANIMATION LOGIC ---
             animations = []
             
-            # Keep track of new rectangles that have a "parent"
-            matched_new_rects = VGroup()
-
-            # For each old rectangle, find the new ones that fall inside it
-            for old_rect in current_approx_rects:
-                children = VGroup()
-                old_rect_x_center = old_rect.get_center()[0]
-                old_rect_width = old_rect.width
-                
-                # Find all new rectangles whose center is within the old one's span
-                for new_rect in next_approx_rects:
-                    if abs(new_rect.get_center()[0] - old_rect_x_center) < old_rect_width / 2:
-                        children.add(new_rect)
-                
-                if len(children) > 0:
+            # Both groups are sorted along x, so each new rectangle's parent is
+            # the last old rectangle starting left of its center (if it spans it)
+            old_centers = np.array([r.get_center()[0] for r in current_approx_rects])
+            old_widths = np.array([r.width for r in current_approx_rects])
+            old_left_edges = old_centers - old_widths / 2
+            new_centers = np.array([r.get_center()[0] for r in next_approx_rects])
+
+            parent_idx = np.searchsorted(old_left_edges, new_centers, side="right") - 1
+            valid = parent_idx >= 0
+            clipped_idx = np.clip(parent_idx, 0, None)
+            valid &= np.abs(new_centers - old_centers[clipped_idx]) < old_widths[clipped_idx] / 2
+            parent_idx[~valid] = -1
+
+            children_per_old = [[] for _ in current_approx_rects]
+            for new_rect, parent in zip(next_approx_rects, parent_idx):
+                if parent >= 0:
+                    children_per_old[parent].append(new_rect)
+
+            # For each old rectangle, split it into the new ones that fall inside it
+            for old_rect, child_list in zip(current_approx_rects, children_per_old):
+                if len(child_list) > 0:
+                    children = VGroup(*child_list)
                     # Create copies of the old rectangle to serve as the source of the transform
                     # This creates the visual effect of one object splitting into many
                     old_rect_copies = VGroup(*[old_rect.copy() for _ in children])
                     animations.append(ReplacementTransform(old_rect_copies, children))
-                    matched_new_rects.add(*children)
                 else:
                     # If an old rectangle has no children, it means the function
                     # value dropped, so it should disappear
@@ -140,7 +160,7 @@ class SimpleFunctionApproximation(Scene):
             # Any new rectangles that were not matched have no parent
             # (e.g., the function rose from zero). These should just fade in.
             unmatched_new_rects = VGroup(*[
-                r for r in next_approx_rects if r not in matched_new_rects
+                r for r, parent in zip(next_approx_rects, parent_idx) if parent < 0
             ])
             if len(unmatched_new_rects) > 0:
                 animations.append(FadeIn(unmatched_new_rects))